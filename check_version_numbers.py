@@ -1,150 +1,183 @@
 #! /usr/bin/env python3
 
+import functools
 import json
 import re
 import sys
-from abc import ABC, abstractmethod
-from io import TextIOWrapper
+import tomllib
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
-import toml
+# Takes the contents of a file and returns the updated contents
+Edit = Callable[[str], str]
 
 
-def replace_in_file(file_name: str, src: str, target: str) -> None:
+@functools.cache
+def _load_toml(file_name: str) -> dict[str, Any]:
+    # Several entries in FILES point at the same Cargo.toml, only parse each once
+    with open(file_name, "rb") as file:
+        data = file.read()
+    return tomllib.loads(data.decode("utf-8"))
+
+
+def replace_in_file(file_name: Path, edits: list[Edit]) -> None:
     with open(file_name, "r") as file:
         contents = file.read()
 
-    contents = re.sub(src, target, contents)
+    for edit in edits:
+        contents = edit(contents)
 
     with open(file_name, "w") as file:
         file.write(contents)
 
 
-class FileType(ABC):
-    @abstractmethod
-    def get_version(self, file: TextIOWrapper) -> str:
-        pass
+@dataclass(frozen=True, slots=True)
+class FileKind:
+    # Reads the current version from the given file
+    get_version: Callable[[Path], str]
+    # Returns the edit that sets the version in a file of this kind
+    version_edit: Callable[[str], Edit]
 
-    @abstractmethod
-    def set_version(self, file_name: str, version: str) -> None:
-        pass
 
+def _toml_version(*keys: str) -> Callable[[Path], str]:
+    def get_version(file: Path) -> str:
+        data = _load_toml(str(file))
+        for key in keys:
+            data = data[key]
+        return data
 
-class Cargo(FileType):
-    def get_version(self, file: TextIOWrapper) -> str:
-        return toml.load(file)["package"]["version"]
+    return get_version
 
-    def set_version(self, file_name: str, version: str) -> None:
-        replace_in_file(
-            file_name,
-            r"version = \"[0-9\.]+\"\nedition = \"2021\"",
-            f'version = "{version}"\nedition = "2021"',
-        )
 
+def _regex_edit(pattern: str, replacement: str) -> Callable[[str], Edit]:
+    compiled = re.compile(pattern)
 
-class CargoMacroDep(FileType):
-    def get_version(self, file: TextIOWrapper) -> str:
-        return toml.load(file)["dependencies"]["kuiper_lang_macros"]["version"]
+    def version_edit(version: str) -> Edit:
+        return functools.partial(compiled.sub, replacement.format(version=version))
 
-    def set_version(self, file_name: str, version: str) -> None:
-        replace_in_file(
-            file_name,
-            r'\[dependencies.kuiper_lang_macros\]\nversion = "[0-9\.]+"',
-            f'[dependencies.kuiper_lang_macros]\nversion = "{version}"',
-        )
+    return version_edit
 
 
-class CargoLangDep(FileType):
-    def get_version(self, file: TextIOWrapper) -> str:
-        return toml.load(file)["dependencies"]["kuiper_lang"]["version"]
+def _get_js_package_version(file: Path) -> str:
+    with open(file, "rb") as f:
+        return json.loads(f.read())["version"]
 
-    def set_version(self, file_name: str, version: str) -> None:
-        replace_in_file(
-            file_name,
-            r'\[dependencies.kuiper_lang\]\nversion = "[0-9\.]+"',
-            f'[dependencies.kuiper_lang]\nversion = "{version}"',
-        )
 
+def _js_package_version_edit(version: str) -> Edit:
+    def edit(contents: str) -> str:
+        data = json.loads(contents)
+        data["version"] = version
+        return json.dumps(data, indent=2, ensure_ascii=False) + "\n"
 
-class PyProject(FileType):
-    def get_version(self, file: TextIOWrapper) -> str:
-        return toml.load(file)["project"]["version"]
+    return edit
 
-    def set_version(self, file_name: str, version: str) -> None:
-        replace_in_file(
-            file_name,
-            r"version = \"[0-9\.]+\"\ndescription =",
-            f'version = "{version}"\ndescription =',
-        )
 
+version_regex = re.compile(r"<Version>([0-9\.]+)</Version>")
+# Upper bound on the length of a full <Version>...</Version> tag
+MAX_VERSION_TAG_LENGTH = 256
 
-class JsPackage(FileType):
-    def get_version(self, file: TextIOWrapper) -> str:
-        return json.load(file)["version"]
 
-    def set_version(self, file_name: str, version: str) -> None:
-        replace_in_file(
-            file_name, r"\"version\": \"[0-9\.]+\",", f'"version": "{version}",'
-        )
+def _get_csproj_version(file: Path) -> str:
+    # The version tag is near the top of the file, so read it in blocks and stop
+    # as soon as we find it. Keep the end of the previous block around so that a tag
+    # split across two blocks is still found.
+    tail = ""
+    with open(file, "r") as f:
+        while block := f.read(4096):
+            dat = tail + block
+            if match := version_regex.search(dat):
+                return match.group(1)
+            tail = dat[-MAX_VERSION_TAG_LENGTH:]
 
+    raise ValueError(f"No <Version> tag found in {file}")
 
-version_regex = re.compile(r"<Version>([0-9\.]+)</Version>")
+
+def _csproj_version_edit(version: str) -> Edit:
+    return functools.partial(version_regex.sub, f"<Version>{version}</Version>")
 
 
-class Csproj(FileType):
-    def get_version(self, file: TextIOWrapper) -> str:
-        dat = file.read()
-        ver = version_regex.search(dat).group(1)
-        return ver
-
-    def set_version(self, file_name: str, version: str) -> None:
-        replace_in_file(
-            file_name, r"<Version>([0-9\.]+)</Version>", f"<Version>{version}</Version>"
-        )
-
-
-FILES: list[tuple[Path, FileType]] = [
-    (Path(__file__).resolve().parent / "kuiper_cli" / "Cargo.toml", Cargo()),
-    (Path(__file__).resolve().parent / "kuiper_lang" / "Cargo.toml", Cargo()),
-    (Path(__file__).resolve().parent / "kuiper_python" / "Cargo.toml", Cargo()),
-    (Path(__file__).resolve().parent / "kuiper_python" / "pyproject.toml", PyProject()),
-    (Path(__file__).resolve().parent / "kuiper_lezer" / "package.json", JsPackage()),
-    (Path(__file__).resolve().parent / "kuiper_js" / "Cargo.toml", Cargo()),
-    (Path(__file__).resolve().parent / "kuiper_lang_macros" / "Cargo.toml", Cargo()),
-    (Path(__file__).resolve().parent / "KuiperNet" / "KuiperNet.csproj", Csproj()),
-    (Path(__file__).resolve().parent / "kuiper_interop" / "Cargo.toml", Cargo()),
-    (
-        Path(__file__).resolve().parent / "kuiper_lang" / "Cargo.toml",
-        CargoMacroDep(),
+CARGO = FileKind(
+    _toml_version("package", "version"),
+    _regex_edit(
+        r"version = \"[0-9\.]+\"\nedition = \"2021\"",
+        'version = "{version}"\nedition = "2021"',
     ),
-    (
-        Path(__file__).resolve().parent / "kuiper_cli" / "Cargo.toml",
-        CargoLangDep(),
+)
+CARGO_MACRO_DEP = FileKind(
+    _toml_version("dependencies", "kuiper_lang_macros", "version"),
+    _regex_edit(
+        r'\[dependencies.kuiper_lang_macros\]\nversion = "[0-9\.]+"',
+        '[dependencies.kuiper_lang_macros]\nversion = "{version}"',
     ),
+)
+CARGO_LANG_DEP = FileKind(
+    _toml_version("dependencies", "kuiper_lang", "version"),
+    _regex_edit(
+        r'\[dependencies.kuiper_lang\]\nversion = "[0-9\.]+"',
+        '[dependencies.kuiper_lang]\nversion = "{version}"',
+    ),
+)
+PYPROJECT = FileKind(
+    _toml_version("project", "version"),
+    _regex_edit(
+        r"version = \"[0-9\.]+\"\ndescription =",
+        'version = "{version}"\ndescription =',
+    ),
+)
+JS_PACKAGE = FileKind(_get_js_package_version, _js_package_version_edit)
+CSPROJ = FileKind(_get_csproj_version, _csproj_version_edit)
+
+
+PROJECT_BASE = Path(__file__).resolve().parent
+
+FILES: list[tuple[Path, FileKind]] = [
+    (PROJECT_BASE / "kuiper_cli" / "Cargo.toml", CARGO),
+    (PROJECT_BASE / "kuiper_lang" / "Cargo.toml", CARGO),
+    (PROJECT_BASE / "kuiper_python" / "Cargo.toml", CARGO),
+    (PROJECT_BASE / "kuiper_python" / "pyproject.toml", PYPROJECT),
+    (PROJECT_BASE / "kuiper_lezer" / "package.json", JS_PACKAGE),
+    (PROJECT_BASE / "kuiper_js" / "Cargo.toml", CARGO),
+    (PROJECT_BASE / "kuiper_lang_macros" / "Cargo.toml", CARGO),
+    (PROJECT_BASE / "KuiperNet" / "KuiperNet.csproj", CSPROJ),
+    (PROJECT_BASE / "kuiper_interop" / "Cargo.toml", CARGO),
+    (PROJECT_BASE / "kuiper_lang" / "Cargo.toml", CARGO_MACRO_DEP),
+    (PROJECT_BASE / "kuiper_cli" / "Cargo.toml", CARGO_LANG_DEP),
 ]
 
 
 def main() -> None:
-    versions = set()
-
     if len(sys.argv) > 1:
         print(f"Setting version to {sys.argv[1]}")
         version = sys.argv[1]
 
-        for file, ty in FILES:
-            ty.set_version(file, version)
+        # Some files are listed more than once, apply all edits to a file in one pass
+        edits: dict[Path, list[Edit]] = {}
+        for file, kind in FILES:
+            edits.setdefault(file, []).append(kind.version_edit(version))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            # Consume the iterator so that any exceptions are raised
+            list(executor.map(replace_in_file, edits.keys(), edits.values()))
     else:
-        for file, ty in FILES:
-            with open(file, "r") as f:
-                version = ty.get_version(f)
-                print(f"{file}: {version}")
-                versions.add(version)
+        first_version = None
+        for file, kind in FILES:
+            version = kind.get_version(file)
+            print(f"{file}: {version}")
+            if first_version is None:
+                first_version = version
+            elif version != first_version:
+                # Read serially so that we stop at the first mismatch
+                print(
+                    f"\nMultiple version numbers found: {first_version} and {version}",
+                    file=sys.stderr,
+                )
+                sys.exit(1)
+
         print()
-        if len(versions) == 1:
-            print(f"All versions are {versions.pop()}")
-        else:
-            print(f"Multiple version numbers found: {versions}", file=sys.stderr)
-            sys.exit(1)
+        print(f"All versions are {first_version}")
 
 
 if __name__ == "__main__":
@@ -1,13 +1,18 @@
 #! /bin/env python
+import mmap
+import operator
+import re
 import sys
 from pathlib import Path
-from typing import TextIO, Any
+from typing import Any, TextIO
 
 import yaml
 
 
 def generate_docs(functions: list[dict[str, Any]], file: TextIO):
-    file.write(
+    # Build the whole output in memory and write it out in one go
+    out: list[str] = []
+    out.append(
         """---
 pagination_next: null
 pagination_prev: null
@@ -18,57 +23,64 @@ title: Functions
 """
     )
     for function in functions:
-        file.write("\n")
-
-        file.write(f"## {function['name'].strip()}\n\n")
-        file.write(f"{function['signature'].strip()}\n\n")
-        file.write(f"{function['description'].strip()}\n\n")
-        file.write(
-            f"**Code example{'s' if len(function['examples']) > 1 else ''}**\n\n"
-        )
-        for i, example in enumerate(function["examples"]):
+        name = function["name"].strip()
+        signature = function["signature"].strip()
+        description = function["description"].strip()
+        examples = function["examples"]
+        plural = "s" if len(examples) > 1 else ""
+
+        out.append("\n")
+
+        out.append(f"## {name}\n\n")
+        out.append(f"{signature}\n\n")
+        out.append(f"{description}\n\n")
+        out.append(f"**Code example{plural}**\n\n")
+        for i, example in enumerate(examples):
             if not isinstance(example, dict):
                 continue
             if i > 0:
-                file.write("\n")
+                out.append("\n")
             if "output" in example:
-                file.write("**Input**\n")
-            file.write("```kuiper\n")
-            file.write(example["input"].strip())
-            file.write("\n```\n")
+                out.append("**Input**\n")
+            out.append("```kuiper\n")
+            out.append(example["input"].strip())
+            out.append("\n```\n")
             if "output" in example:
-                file.write("**Output**\n")
-                file.write("```\n")
-                file.write(str(example["output"]).strip())
-                file.write("\n```\n")
+                out.append("**Output**\n")
+                out.append("```\n")
+                out.append(str(example["output"]).strip())
+                out.append("\n```\n")
 
+    file.write("".join(out))
 
-def generate_warning_header(file: TextIO, comment_tag="//"):
-    file.write(
+
+def generate_warning_header(out: list[str], comment_tag="//"):
+    out.append(
         f"{comment_tag} This file is automatically created by kuiper_documentation/codegen.py. Do not edit it directly.\n"
     )
-    file.write(f"{comment_tag}\n")
-    file.write(
+    out.append(f"{comment_tag}\n")
+    out.append(
         f"{comment_tag} To change the content of this file, edit kuiper_documentation/functions.yaml instead.\n\n"
     )
 
 
 def generate_repl_list(functions: list[dict[str, Any]], file: TextIO):
-    generate_warning_header(file)
+    out: list[str] = []
+    generate_warning_header(out)
 
-    file.write(
+    out.append(
         """use lazy_static::lazy_static;
 use std::collections::HashMap;
 
 """
     )
 
-    file.write(f"pub const BUILT_INS: [&str; {len(functions)}] = [\n")
+    out.append(f"pub const BUILT_INS: [&str; {len(functions)}] = [\n")
     for function in functions:
-        file.write(f'    "{function["name"].strip()}(",\n')
-    file.write("];\n")
+        out.append(f'    "{function["name"].strip()}(",\n')
+    out.append("];\n")
 
-    file.write(
+    out.append(
         """
 pub struct FunctionDef {
     pub signature: &'static str,
@@ -81,7 +93,7 @@ lazy_static! {
     )
 
     for function in functions:
-        file.write(
+        out.append(
             f"""
         (
             "{function["name"]}",
@@ -92,67 +104,49 @@ lazy_static! {
         ),"""
         )
 
-    file.write(
+    out.append(
         """
     ]);
 }\n"""
     )
 
+    file.write("".join(out))
+
 
 def generate_js_list(functions: list[dict[str, Any]], file: TextIO):
-    generate_warning_header(file)
+    out: list[str] = []
+    generate_warning_header(out)
 
-    file.write(
+    out.append(
         """export type KuiperInput = {
     label: string,
     description: string,
 };\n\n"""
     )
 
-    file.write("export const builtIns: KuiperInput[] = [\n")
+    out.append("export const builtIns: KuiperInput[] = [\n")
 
     for function in functions:
         short_desc = function["description"].split("\n")[0].strip()
-        file.write(
+        out.append(
             f'    {{ label: "{function["name"].strip()}", description: "{function["signature"].strip()}: {short_desc}" }},\n'
         )
 
-    file.write("];\n")
-
-
-def find_function_defs(file: TextIO) -> set[str]:
-    names = set()
-
-    in_func = False
-    in_match = False
+    out.append("];\n")
 
-    # Very nasty, don't look
-    for line in file:
-        if "get_function_expression" in line:
-            in_func = True
-            continue
+    file.write("".join(out))
 
-        if not in_func:
-            continue
 
-        if "match name" in line:
-            in_match = True
-            continue
+function_arm_regex = re.compile(rb'"([A-Za-z_][A-Za-z0-9_]*)"\s*=>')
 
-        if not in_match:
-            continue
 
-        if line.strip() == "};":
-            break
+def find_function_defs(path: Path) -> set[str]:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Only look at the arms of the `match name` block in `get_function_expression`
+        start = mm.find(b"match name", mm.find(b"get_function_expression"))
+        end = mm.find(b"};", start)
 
-        if "=>" not in line:
-            continue
-
-        name = line.split("=>")[0].strip().strip('"')
-        if name != "_":
-            names.add(name)
-
-    return names
+        return {name.decode() for name in function_arm_regex.findall(mm, start, end)}
 
 
 def main():
@@ -161,24 +155,22 @@ def main():
     with open(project_base / "kuiper_documentation" / "functions.yaml") as f:
         functions: list[dict[str, Any]] = yaml.safe_load(f)["functions"]
 
-    functions.sort(key=lambda function: function["name"])
+    functions.sort(key=operator.itemgetter("name"))
 
     function_names = {function["name"] for function in functions}
-    with open(project_base / "kuiper_lang" / "src" / "expressions" / "base.rs") as f:
-        true_function_names = find_function_defs(f)
-
-    return_val = 0
-
-    for function in true_function_names:
-        if function not in function_names:
-            print(f"Missing documentation for {function}", file=sys.stderr)
-            return_val = 1
-    for function in function_names:
-        if function not in true_function_names:
-            print(
-                f"Function {function} is documented, but doesn't exist", file=sys.stderr
-            )
-            return_val = 1
+    true_function_names = find_function_defs(
+        project_base / "kuiper_lang" / "src" / "expressions" / "base.rs"
+    )
+
+    missing = true_function_names - function_names
+    extra = function_names - true_function_names
+
+    for function in sorted(missing):
+        print(f"Missing documentation for {function}", file=sys.stderr)
+    for function in sorted(extra):
+        print(f"Function {function} is documented, but doesn't exist", file=sys.stderr)
+
+    return_val = 1 if missing or extra else 0
 
     with open(
         project_base / "kuiper_documentation" / "built_in_functions.md", "w"
@@ -14,11 +14,13 @@ object. The ``KuiperExpression.run(...)`` method might raise a ``KuiperRuntimeEr
 subclasses of the ``KuiperError`` base class.
 """
 
+import functools
+
 from ._core import (
     CustomFunction,
     KuiperExpression,
-    compile_expression,
 )
+from ._core import compile_expression as _compile_expression_raw
 
 type JsonType = str | int | float | bool | None | list["JsonType"] | dict[str, "JsonType"]
 
@@ -38,6 +40,58 @@ class KuiperRuntimeError(KuiperError):
     pass
 
 
+@functools.lru_cache(maxsize=1024)
+def _compile_expression_cached(
+    expression: str,
+    inputs: tuple[str, ...],
+    options: tuple[tuple[str, int], ...],
+) -> KuiperExpression:
+    return _compile_expression_raw(expression, list(inputs), **dict(options))
+
+
+def compile_expression(
+    expression: str,
+    inputs: list[str],
+    optimizer_operation_limit: int | None = None,
+    max_macro_expansions: int | None = None,
+    custom_functions: list[CustomFunction] | None = None,
+) -> KuiperExpression:
+    """
+    Compile a Kuiper expression.
+
+    This function compiles a Kuiper expression into a ``KuiperExpression`` object. Compiled expressions are cached, so
+    compiling the same expression with the same inputs and configuration again returns the same object. Expressions
+    using custom functions are not cached, and are compiled on every call.
+
+    Args:
+        expression:                 The Kuiper expression to compile.
+        inputs:                     A list of input names for the expression.
+        optimizer_operation_limit:  Maximum number of operations allowed during optimization. Uses the compiler
+                                    default if not given.
+        max_macro_expansions:       Maximum number of macro expansions allowed. Uses the compiler default if not
+                                    given.
+        custom_functions:           Optional list of custom functions to include.
+
+    Returns:
+        A ``KuiperExpression`` object representing the compiled expression.
+
+    Raises:
+        KuiperCompileError: If the compilation encounters an error.
+    """
+    # Only forward the options that were given, so the defaults are defined in one place
+    options: dict[str, int] = {}
+    if optimizer_operation_limit is not None:
+        options["optimizer_operation_limit"] = optimizer_operation_limit
+    if max_macro_expansions is not None:
+        options["max_macro_expansions"] = max_macro_expansions
+
+    if custom_functions is not None:
+        # Caching these would keep the Python callables alive for the lifetime of the process
+        return _compile_expression_raw(expression, inputs, custom_functions=custom_functions, **options)
+
+    return _compile_expression_cached(expression, tuple(inputs), tuple(sorted(options.items())))
+
+
 __all__ = [
     "KuiperCompileError",
     "KuiperError",
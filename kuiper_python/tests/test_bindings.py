@@ -2,7 +2,7 @@ import json
 
 import pytest
 
-from kuiper import JsonType, KuiperCompileError, compile_expression, CustomFunction
+from kuiper import JsonType, KuiperCompileError, KuiperExpression, compile_expression, CustomFunction
 
 
 @pytest.mark.parametrize(
@@ -25,21 +25,49 @@ def test_compile(expression: str, should_work: bool) -> None:
     assert should_work == worked
 
 
+def test_compile_cached() -> None:
+    first = compile_expression("input.map(i => i + 1)", ["input"])
+    assert compile_expression("input.map(i => i + 1)", ["input"]) is first
+    assert compile_expression("input.map(i => i + 1)", ["input"], max_macro_expansions=10) is not first
+
+    # Compile errors are not cached
+    for _ in range(2):
+        with pytest.raises(KuiperCompileError):
+            compile_expression("input2", ["input"])
+
+    # Expressions with custom functions are compiled on every call
+    functions = [CustomFunction("simple_target", simple_target)]
+    with_custom = compile_expression("input.map(i => i + 1)", ["input"], custom_functions=functions)
+    assert with_custom is not first
+    assert compile_expression("input.map(i => i + 1)", ["input"], custom_functions=functions) is not with_custom
+
+
 test_cases: list[tuple[str, JsonType, JsonType]] = [
     ("input", {"hello": "there"}, {"hello": "there"}),
     ("input.map(i => i + 4)", [1, 2, 3, 4], [5, 6, 7, 8]),
 ]
 
+test_case_ids = [expression for expression, _, _ in test_cases]
+
+
+@pytest.fixture(scope="session")
+def compiled() -> dict[str, KuiperExpression]:
+    return {expression: compile_expression(expression, ["input"]) for expression, _, _ in test_cases}
+
 
-@pytest.mark.parametrize("expression,input,expected_result", test_cases)
-def test_run_json(expression: str, input: JsonType, expected_result: JsonType) -> None:
-    result = compile_expression(expression, ["input"]).run_json(json.dumps(input))
+@pytest.mark.parametrize("expression,input,expected_result", test_cases, ids=test_case_ids)
+def test_run_json(
+    compiled: dict[str, KuiperExpression], expression: str, input: JsonType, expected_result: JsonType
+) -> None:
+    result = compiled[expression].run_json(json.dumps(input))
     assert json.loads(result) == expected_result
 
 
-@pytest.mark.parametrize("expression,input,expected_result", test_cases)
-def test_run_values(expression: str, input: JsonType, expected_result: JsonType) -> None:
-    result = compile_expression(expression, ["input"]).run(input)
+@pytest.mark.parametrize("expression,input,expected_result", test_cases, ids=test_case_ids)
+def test_run_values(
+    compiled: dict[str, KuiperExpression], expression: str, input: JsonType, expected_result: JsonType
+) -> None:
+    result = compiled[expression].run(input)
     assert result == expected_result
 
 